@@ -1,11 +1,16 @@
 # app.py — Metrics Report (Patriot-inspired theme, store-timestamped trends, no logo upload)
 # Python 3.12 recommended (runtime.txt -> python-3.12)
 
-import os, io, re, glob, time, base64, hashlib
+import os, io, re, csv, glob, time, base64, fnmatch, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 import streamlit as st
 
+# Copy-on-write keeps slices (previews, filtered views) as lazy views until written.
+pd.options.mode.copy_on_write = True
+
 # ---------- Optional libs ----------
 try:
     import altair as alt
@@ -19,6 +24,30 @@ try:
 except Exception:
     HAS_REQUESTS = False
 
+try:
+    # Rust-backed Excel reader; pandas grew the "calamine" engine in 2.2.
+    import python_calamine  # noqa: F401
+    from packaging.version import Version
+    HAS_CALAMINE = Version(pd.__version__) >= Version("2.2.0")
+except Exception:
+    HAS_CALAMINE = False
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except Exception:
+    HAS_PYARROW = False
+
+# ---------- Column synonyms (module-level tuples: no per-rerun allocation) ----------
+SKILL_SYNS  = ("skill", "skill name", "skill group", "group", "queue", "split", "team", "program", "department", "dept", "category", "line of business", "lob")
+CALLS_SYNS  = ("calls", "total calls", "calls offered", "offered", "inbound calls", "in calls", "total contacts", "contacts", "total interactions", "volume")
+AGENTS_SYNS = ("agents staffed", "agents", "agent count", "staffed agents", "distinct agents", "distinct agent count", "unique agents")
+AHT_SYNS    = ("aht", "average handle time", "avg handle time", "avg handling time", "avg handle", "aht (s)", "aht (sec)", "talk+hold+acw")
+ABAND_CNT_SYNS = ("abandoned count", "abandoned", "abandon count", "aband count", "abandoned calls")
+ABAND_PCT_SYNS = ("abandon %", "abandoned (%rec)", "abandonment rate", "abandon rate")
+CALLS_SYNS_ALL   = ("calls", "total calls", "calls offered", "offered", "inbound calls", "contacts", "total contacts", "volume")
+AGENTS_SYNS_MINI = ("agents staffed", "agents", "agent count", "distinct", "unique")
+
 # ---------- Page config ----------
 st.set_page_config(page_title="Metrics Report", layout="wide")
 
@@ -37,11 +66,8 @@ PATRIOT_THEME = {
     "shadow": "0 8px 24px rgba(2, 6, 23, 0.06)",
 }
 
-def apply_theme(t=PATRIOT_THEME):
-    if t.get("font_url"):
-        st.markdown(f'<link rel="stylesheet" href="{t["font_url"]}">', unsafe_allow_html=True)
-
-    css = f"""
+def _build_theme_css(t) -> str:
+    return f"""
     <style>
       :root {{
         --bg: {t["bg"]};
@@ -130,7 +156,16 @@ def apply_theme(t=PATRIOT_THEME):
       h2 {{ border-bottom: 2px solid var(--accent); padding-bottom: 4px; }}
     </style>
     """
-    st.markdown(css, unsafe_allow_html=True)
+
+# Formatted once at import; reruns re-emit the same string without paying the
+# f-string interpolation (Streamlit clears the page per rerun, so the
+# st.markdown call itself can't be skipped).
+_THEME_CSS = _build_theme_css(PATRIOT_THEME)
+
+def apply_theme(t=PATRIOT_THEME):
+    if t.get("font_url"):
+        st.markdown(f'<link rel="stylesheet" href="{t["font_url"]}">', unsafe_allow_html=True)
+    st.markdown(_THEME_CSS if t is PATRIOT_THEME else _build_theme_css(t), unsafe_allow_html=True)
 
 def render_header(title="Metrics Report"):
     st.markdown(
@@ -149,58 +184,129 @@ render_header("Metrics Report")
 # ---------------- END THEME ----------------
 
 # ================== Generic helpers ==================
+_NORM_RE = re.compile(r"[^a-z0-9]+")
+_NUMERIC_RE = re.compile(r"-?\d+(\.\d+)?")        # bare seconds value
+_LEADING_NUM_RE = re.compile(r"(\d+(\.\d+)?)")    # leading number with junk after
+_HDR_RE = re.compile(r"^(#{2,3})\s+(.*)$")  # Markdown heading lines, shared by the exporters
+
+@lru_cache(maxsize=4096)
 def norm(s: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "", str(s).lower())
+    return _NORM_RE.sub("", str(s).lower())
 
-def find_col(df: pd.DataFrame, synonyms) -> str | None:
-    cols = list(df.columns)
+@st.cache_data(show_spinner=False)
+def _find_col_by_names(cols: tuple, synonyms: tuple) -> str | None:
     norm_map = {norm(c): c for c in cols}
-    syn_norm = [norm(x) for x in synonyms if str(x).strip()]
+    syn_norm = tuple(filter(None, (norm(x) for x in synonyms if str(x).strip())))
     for s in syn_norm:
         if s in norm_map: return norm_map[s]
-    for c in cols:
-        nc = norm(c)
+    # Contains phase reuses the already-normalized keys; no second norm() pass.
+    for nc, c in norm_map.items():
         for s in syn_norm:
-            if s and (s in nc or nc in s): return c
+            if s in nc or nc in s: return c
     return None
 
+def find_col(df: pd.DataFrame, synonyms) -> str | None:
+    return _find_col_by_names(tuple(map(str, df.columns)), tuple(map(str, synonyms)))
+
+def autodetect_columns(df: pd.DataFrame, synonym_map: dict) -> dict:
+    """Resolve all column guesses in one pass over a single norm_map."""
+    norm_map = {norm(c): c for c in map(str, df.columns)}
+    out = {}
+    for key, synonyms in synonym_map.items():
+        syn_norm = [norm(x) for x in synonyms if str(x).strip()]
+        hit = next((norm_map[s] for s in syn_norm if s in norm_map), None)
+        if hit is None:
+            hit = next((c for nc, c in norm_map.items()
+                        for s in syn_norm if s and (s in nc or nc in s)), None)
+        out[key] = hit
+    return out
+
+_ABAND_REC_NORM = norm("Abandoned (%rec)")
+
+def rename_aband_rec(df_in: pd.DataFrame) -> pd.DataFrame:
+    """Canonicalize any spelling of 'Abandoned (%rec)' to 'Abandon %' in one rename."""
+    ren = {c: "Abandon %" for c in df_in.columns if norm(c) == _ABAND_REC_NORM}
+    return df_in.rename(columns=ren) if ren else df_in
+
+def df_cache_key(df_in: pd.DataFrame) -> bytes:
+    """Stable content key via pandas' vectorized row hash — much cheaper than
+    Streamlit's default pickle-based hashing of MB-scale DataFrames."""
+    vals = pd.util.hash_pandas_object(df_in, index=False).values.tobytes()
+    cols = ",".join(map(str, df_in.columns)).encode()
+    return hashlib.sha256(vals + cols).digest()
+
+# Cached functions taking a df_key alongside their frame/series args use these
+# so Streamlit hashes only the precomputed key.
+_SKIP_PANDAS_HASH = {pd.DataFrame: lambda _: None, pd.Series: lambda _: None}
+
 def idx_or_default(options, value):
     try: return options.index(value) if value in options else 0
     except Exception: return 0
 
+def _read_csv_fast(obj):
+    """CSV via the parallel pyarrow engine (Arrow-backed columns); falls back to the C engine."""
+    if HAS_PYARROW:
+        try:
+            return pd.read_csv(obj, engine="pyarrow", dtype_backend="pyarrow")
+        except Exception:
+            if hasattr(obj, "seek"): obj.seek(0)
+    return pd.read_csv(obj)
+
 def read_any(uploaded_or_bytes, name_hint: str | None = None):
     """Read CSV or Excel from file-like, path-like or raw bytes."""
     if isinstance(uploaded_or_bytes, (bytes, bytearray)):
         bio = io.BytesIO(uploaded_or_bytes)
         try:
-            bio.seek(0); return pd.read_csv(bio)
+            bio.seek(0); return _read_csv_fast(bio)
         except Exception:
-            bio.seek(0); return pd.read_excel(bio)
+            bio.seek(0); return pd.read_excel(bio, engine="calamine" if HAS_CALAMINE else None)
     name = (getattr(uploaded_or_bytes, "name", None) or name_hint or "").lower()
     try:
-        if name.endswith(".csv"):  return pd.read_csv(uploaded_or_bytes)
-        if name.endswith(".xlsx"): return pd.read_excel(uploaded_or_bytes, engine="openpyxl")
-        if name.endswith(".xls"):  return pd.read_excel(uploaded_or_bytes, engine="xlrd")
-        try:    return pd.read_csv(uploaded_or_bytes)
+        if name.endswith(".csv"):  return _read_csv_fast(uploaded_or_bytes)
+        if name.endswith(".xlsx"):
+            if HAS_CALAMINE: return pd.read_excel(uploaded_or_bytes, engine="calamine")
+            try:
+                # read_only skips the full workbook object model; keep_links drops linked-workbook caches
+                return pd.read_excel(uploaded_or_bytes, engine="openpyxl",
+                                     engine_kwargs={"read_only": True, "data_only": True, "keep_links": False})
+            except TypeError:  # pandas < 1.5 has no engine_kwargs
+                if hasattr(uploaded_or_bytes, "seek"): uploaded_or_bytes.seek(0)
+                return pd.read_excel(uploaded_or_bytes, engine="openpyxl")
+        if name.endswith(".xls"):  return pd.read_excel(uploaded_or_bytes, engine="calamine" if HAS_CALAMINE else "xlrd")
+        try:    return _read_csv_fast(uploaded_or_bytes)
         except:
             if hasattr(uploaded_or_bytes, "seek"): uploaded_or_bytes.seek(0)
             return pd.read_excel(uploaded_or_bytes)
     except Exception as e:
         raise RuntimeError(f"Failed to read file: {e}")
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def read_any_cached(raw: bytes, name_hint: str | None = None) -> pd.DataFrame:
+    """Cached read_any over raw bytes so reruns skip the re-parse."""
+    return read_any(raw, name_hint)
+
 def to_percent(series_like):
-    s = pd.Series(series_like).astype(str).str.replace('%', '', regex=False)
+    s = pd.Series(series_like)
     vals = pd.to_numeric(s, errors='coerce')
-    d = vals.dropna()
-    mx = d.max() if not d.empty else None
-    if mx is not None and mx <= 1.0:
-        vals = vals * 100.0
+    if vals.isna().all():
+        # String column (e.g. "12.3%") — strip the suffix and reparse.
+        vals = pd.to_numeric(s.astype(str).str.removesuffix('%').str.strip(), errors='coerce')
+    mx = vals.max(skipna=True)
+    if pd.notna(mx) and mx <= 1.0:
+        vals *= 100.0
     return vals
 
+def normalize_skill_series(s: pd.Series) -> pd.Series:
+    """Strip + Fortress→PM Connect via the category dictionary (O(unique), not O(rows))."""
+    cat = s.astype("category")
+    mapping = {c: ("PM Connect" if str(c).strip().lower() == "fortress" else str(c).strip())
+               for c in cat.cat.categories}
+    return cat.map(mapping).astype("category")
+
 def parse_duration_to_seconds(x) -> float:
     if pd.isna(x): return np.nan
     s = str(x).strip()
-    if re.fullmatch(r"^-?\d+(\.\d+)?$", s): return float(s)
+    if _NUMERIC_RE.fullmatch(s): return float(s)
     if ":" in s:
         try:
             parts = [float(p) for p in s.split(":")]
@@ -208,81 +314,190 @@ def parse_duration_to_seconds(x) -> float:
             if len(parts) == 2: m, s2 = parts; return m*60 + s2
         except Exception:
             return np.nan
-    m = re.match(r"(\d+(\.\d+)?)", s)
+    m = _LEADING_NUM_RE.match(s)
     return float(m.group(1)) if m else np.nan
 
+def vec_parse_duration_to_seconds(series_like) -> pd.Series:
+    """Vectorized parse_duration_to_seconds: one pass of string kernels +
+    numpy arithmetic instead of a Python call per row."""
+    s = pd.Series(series_like).astype("string").str.strip()
+    out = pd.to_numeric(s, errors="coerce").astype("float64")  # bare-number fast path
+    colon = s.str.contains(":", regex=False).fillna(False).astype(bool)
+    if colon.any():
+        parts = s[colon].str.split(":", n=2, expand=True)
+        p0 = pd.to_numeric(parts[0], errors="coerce").astype("float64")
+        p1 = (pd.to_numeric(parts[1], errors="coerce").astype("float64")
+              if 1 in parts.columns else np.full(len(parts), np.nan))
+        if 2 in parts.columns:
+            has3 = parts[2].notna().to_numpy()
+            p2 = pd.to_numeric(parts[2], errors="coerce").astype("float64")
+            secs = np.where(has3, p0 * 3600 + p1 * 60 + p2, p0 * 60 + p1)
+        else:
+            secs = p0 * 60 + p1
+        out[colon] = np.asarray(secs, dtype="float64")
+    # Leading-number fallback for strings like "95 sec"
+    rem = out.isna() & ~colon & s.notna()
+    if rem.any():
+        out[rem] = pd.to_numeric(s[rem].str.extract(r"^(\d+(?:\.\d+)?)", expand=False),
+                                 errors="coerce").astype("float64")
+    return out
+
 def format_seconds(secs: float) -> str:
     if pd.isna(secs): return "N/A"
     secs = float(secs)
     h = int(secs // 3600); m = int((secs % 3600) // 60); s = int(secs % 60)
     return f"{h:d}:{m:02d}:{s:02d}" if h > 0 else f"{m:d}:{s:02d}"
 
+def vec_format_seconds(series_like) -> pd.Series:
+    """Vectorized format_seconds: the h/m/s split runs in numpy, only the
+    final string formatting stays per-row."""
+    secs = pd.to_numeric(series_like, errors="coerce")
+    vals = secs.to_numpy(dtype=float)
+    out = np.full(vals.shape, "N/A", dtype=object)
+    ok = ~np.isnan(vals)
+    if ok.any():
+        t = vals[ok].astype(np.int64)
+        h, rem = np.divmod(t, 3600)
+        m, s = np.divmod(rem, 60)
+        out[ok] = [f"{hh:d}:{mm:02d}:{ss:02d}" if hh > 0 else f"{mm:d}:{ss:02d}"
+                   for hh, mm, ss in zip(h.tolist(), m.tolist(), s.tolist())]
+    return pd.Series(out, index=secs.index)
+
+# Store stamps are always "%Y-%m-%d %H:%M:%S"; the rest cover common exports.
+_DT_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%m/%d/%Y %H:%M", "%m/%d/%Y")
+
+def parse_datetime_fast(s: pd.Series) -> pd.Series:
+    """to_datetime with an explicit format inferred from the first non-null
+    value — an order of magnitude faster than per-row format guessing."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    sample = s.dropna().astype(str).head(1)
+    if not sample.empty:
+        for fmt in _DT_FORMATS:
+            try:
+                pd.to_datetime(sample, format=fmt, errors="raise")
+                return pd.to_datetime(s, format=fmt, errors="coerce")
+            except Exception:
+                continue
+    return pd.to_datetime(s, errors="coerce", cache=True)
+
 def add_time_columns(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
-    dts = pd.to_datetime(df[date_col], errors="coerce")
-    out = df.copy()
+    dts = parse_datetime_fast(df[date_col])
+    # copy-on-write is enabled, so a shallow copy shares column data and the
+    # new derived columns never touch the caller's frame
+    out = df.copy(deep=False)
     out["_DT"] = dts
-    out["_DATE"] = dts.dt.normalize()
-    out["_WEEK_START"] = dts.dt.to_period("W-MON").dt.start_time
-    out["_MONTH_START"] = dts.dt.to_period("M").dt.start_time
+    # numpy day-truncation beats .dt.normalize(), and .dt.to_timestamp() is a
+    # single pass where .dt.start_time materialized an intermediate array
+    out["_DATE"] = pd.Series(dts.to_numpy().astype("datetime64[D]").astype("datetime64[ns]"),
+                             index=dts.index)
+    out["_WEEK_START"] = dts.dt.to_period("W-MON").dt.to_timestamp()
+    out["_MONTH_START"] = dts.dt.to_period("M").dt.to_timestamp()
     return out
 
-def aggregate_by_period_all_skills(df_time: pd.DataFrame,
+@st.cache_data(show_spinner=False, hash_funcs=_SKIP_PANDAS_HASH)
+def prepare_trend_frame(df_key: bytes,
+                        df_time: pd.DataFrame,
+                        skill_col: str,
+                        calls_col: str,
+                        aht_sec_col: str,
+                        rate_pct_series: pd.Series | None,
+                        aband_count_col: str | None) -> pd.DataFrame:
+    """Slim frame with the numeric coercions done once, shared by the
+    daily/weekly/monthly rollups instead of redone per period."""
+    calls_num = pd.to_numeric(df_time[calls_col], errors="coerce").fillna(0.0)
+    aht_sec = pd.to_numeric(df_time[aht_sec_col], errors="coerce")
+    prepped = pd.DataFrame({
+        skill_col: df_time[skill_col],
+        "_DATE": df_time["_DATE"],
+        "_WEEK_START": df_time["_WEEK_START"],
+        "_MONTH_START": df_time["_MONTH_START"],
+        "Calls_num": calls_num,
+        # Pre-multiply so the calls-weighted means reduce to plain grouped
+        # sums (Cython path) instead of a Python callback per group.
+        "_AHT_x_C": aht_sec.fillna(0.0) * calls_num,
+    })
+    if aband_count_col and aband_count_col in df_time.columns:
+        prepped["_AB_CNT"] = pd.to_numeric(df_time[aband_count_col], errors="coerce")
+    elif rate_pct_series is not None:
+        rate_num = pd.to_numeric(rate_pct_series, errors="coerce")  # 0..100
+        prepped["_AR_x_C"] = rate_num.fillna(0.0) * calls_num
+    return prepped
+
+@st.cache_data(show_spinner=False, hash_funcs=_SKIP_PANDAS_HASH)
+def aggregate_by_period_all_skills(df_key: bytes,
+                                   prepped: pd.DataFrame,
                                    skill_col: str,
-                                   calls_col: str,
-                                   aht_sec_col: str,
-                                   rate_pct_series: pd.Series | None,
-                                   aband_count_col: str | None,
                                    period_col: str) -> pd.DataFrame:
-    tmp = df_time.copy()
-    tmp["Calls_num"] = pd.to_numeric(tmp[calls_col], errors="coerce").fillna(0.0)
-    tmp["AHT_sec"]   = pd.to_numeric(tmp[aht_sec_col], errors="coerce")
-
-    if aband_count_col and aband_count_col in tmp.columns:
-        tmp["_AB_CNT"] = pd.to_numeric(tmp[aband_count_col], errors="coerce")
-    if rate_pct_series is not None:
-        tmp["_AB_RATE"] = pd.to_numeric(rate_pct_series, errors="coerce")  # 0..100
-
-    g = tmp.groupby([skill_col, period_col], dropna=False)
-    calls_sum = g["Calls_num"].sum()
-
-    def _wa(group):
-        denom = group["Calls_num"].sum()
-        return np.nansum(group["AHT_sec"] * group["Calls_num"]) / denom if denom > 0 else np.nan
-    aht_w = g.apply(_wa)
-
-    if "_AB_CNT" in tmp.columns:
-        ab_cnt = g["_AB_CNT"].sum()
-        ab_pct = (ab_cnt / calls_sum.replace(0, np.nan)) * 100.0
-    elif "_AB_RATE" in tmp.columns:
-        def _weighted_rate(group):
-            r = group["_AB_RATE"]
-            return np.nansum(r * group["Calls_num"]) / group["Calls_num"].sum() if group["Calls_num"].sum() > 0 else np.nan
-        ab_pct = g.apply(_weighted_rate)
+    agg_cols = [c for c in ("Calls_num", "_AHT_x_C", "_AB_CNT", "_AR_x_C")
+                if c in prepped.columns]
+
+    # observed=True keeps categorical skill columns from emitting empty
+    # category x period combinations
+    # sort=False skips the group-key sort; the output is sorted once at the end
+    g = prepped.groupby([skill_col, period_col], dropna=False, observed=True, sort=False)
+    sums = g[agg_cols].sum()
+    calls_sum = sums["Calls_num"]
+    cs = calls_sum.to_numpy(dtype=float)
+    has_calls = cs > 0
+
+    aht_vals = np.full_like(cs, np.nan)
+    np.divide(sums["_AHT_x_C"].to_numpy(dtype=float), cs, out=aht_vals, where=has_calls)
+    aht_w = pd.Series(aht_vals, index=calls_sum.index)
+
+    if "_AB_CNT" in sums.columns:
+        out = np.full_like(cs, np.nan)
+        np.divide(sums["_AB_CNT"].to_numpy(dtype=float), cs, out=out, where=has_calls)
+        out *= 100.0
+        ab_pct = pd.Series(out, index=calls_sum.index)
+    elif "_AR_x_C" in sums.columns:
+        out = np.full_like(cs, np.nan)
+        np.divide(sums["_AR_x_C"].to_numpy(dtype=float), cs, out=out, where=has_calls)
+        ab_pct = pd.Series(out, index=calls_sum.index)
     else:
         ab_pct = pd.Series(index=calls_sum.index, dtype=float)
 
+    idx = calls_sum.index
     out = pd.DataFrame({
-        "Skill": [i[0] for i in calls_sum.index],
-        "period": [i[1] for i in calls_sum.index],
-        "Calls": calls_sum.values,
-        "AHT_sec": aht_w.values,
-        "Abandon %": ab_pct.values
+        # np.asarray keeps these object/datetime arrays as before even when
+        # the skill level is categorical
+        "Skill": np.asarray(idx.get_level_values(0)),
+        "period": np.asarray(idx.get_level_values(1)),
+        "Calls": calls_sum.to_numpy(),
+        "AHT_sec": aht_w.to_numpy(),
+        "Abandon %": ab_pct.to_numpy()
     })
-    out["AHT"] = out["AHT_sec"].apply(format_seconds)
+    out["AHT"] = vec_format_seconds(out["AHT_sec"])
     out.sort_values(["Skill", "period"], inplace=True)
     return out
 
+@st.cache_data(show_spinner=False)
+def df_csv(df_in: pd.DataFrame, sep: str = ",") -> str:
+    """Memoized CSV text for the copy/paste tabs; reruns reuse the same string."""
+    return df_in.to_csv(index=False, sep=sep)
+
 def build_excel_bytes(sheets: dict[str, pd.DataFrame]) -> bytes:
+    # xlsxwriter in constant_memory mode streams rows instead of holding the
+    # whole workbook in Python objects; openpyxl stays as the fallback.
     try:
-        import openpyxl
+        import xlsxwriter  # noqa: F401
+        engine, engine_kwargs = "xlsxwriter", {"options": {
+            "constant_memory": True,
+            # plain data dump: skip per-cell formula/URL sniffing
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        }}
     except Exception:
-        raise RuntimeError("openpyxl not installed. Add it to requirements.txt")
+        try:
+            import openpyxl  # noqa: F401
+            engine, engine_kwargs = "openpyxl", {}
+        except Exception:
+            raise RuntimeError("Neither xlsxwriter nor openpyxl installed. Add one to requirements.txt")
     bio = io.BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+    with pd.ExcelWriter(bio, engine=engine, engine_kwargs=engine_kwargs) as writer:
         for sheet_name, df_ in sheets.items():
             df_.to_excel(writer, index=False, sheet_name=(sheet_name[:31] or "Sheet1"))
-    bio.seek(0)
-    return bio.read()
+    return bio.getvalue()
 
 # ================== Upload stamping helpers ==================
 UPLOADS_DIR = "./_uploads"
@@ -302,6 +517,15 @@ def _ensure_uploads_dir():
 def _uploads_manifest_path():
     return os.path.join(UPLOADS_DIR, "uploads_manifest.csv")
 
+def _append_manifest_row(path: str, row: dict, cols: list[str]):
+    """O(1) manifest append: header once, then one csv row per call — no
+    read-whole-file/rewrite cycle per entry."""
+    new = not os.path.exists(path)
+    with open(path, "a", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=cols)
+        if new: w.writeheader()
+        w.writerow(row)
+
 def _append_upload_manifest(path: str, role: str, nbytes: int):
     cols = ["path", "role", "bytes", "added_at"]
     row = {
@@ -309,12 +533,7 @@ def _append_upload_manifest(path: str, role: str, nbytes: int):
         "added_at": time.strftime("%Y-%m-%d %H:%M:%S"),
     }
     try:
-        if os.path.exists(_uploads_manifest_path()):
-            m = pd.read_csv(_uploads_manifest_path())
-        else:
-            m = pd.DataFrame(columns=cols)
-        m = pd.concat([m, pd.DataFrame([row])], ignore_index=True)
-        m.to_csv(_uploads_manifest_path(), index=False)
+        _append_manifest_row(_uploads_manifest_path(), row, cols)
     except Exception:
         pass
 
@@ -374,40 +593,42 @@ def load_manifest() -> pd.DataFrame:
             return pd.DataFrame(columns=["path","bytes_hash","source","rows","cols","added_at"])
     return pd.DataFrame(columns=["path","bytes_hash","source","rows","cols","added_at"])
 
-def save_manifest(dfm: pd.DataFrame):
-    try:
-        dfm.to_csv(manifest_path(), index=False)
-    except Exception as e:
-        st.sidebar.warning(f"Manifest save failed: {e}")
-
 def save_snapshot_bytes(b: bytes, source_label: str = "snapshot") -> tuple[bool, str]:
     if not ensure_store(): return False, "Store not available"
-    h = hashlib.sha256(b).hexdigest()
+    # dedup only needs a fast content fingerprint, not a crypto hash
+    h = hashlib.blake2b(b, digest_size=16).hexdigest()
     dfm = load_manifest()
     if (dfm["bytes_hash"] == h).any():
         return False, "Duplicate snapshot (already stored)"
     ts = time.strftime("%Y%m%d_%H%M%S")
-    fname = f"{ts}_{h[:8]}.csv"
-    path = os.path.join(store_dir, fname)
+    base = os.path.join(store_dir, f"{ts}_{h[:8]}")
     try:
-        with open(path, "wb") as f:
-            f.write(b)
         try:
-            tmp = pd.read_csv(io.BytesIO(b)); rows, cols = tmp.shape
+            tmp = _read_csv_fast(io.BytesIO(b)); rows, cols = tmp.shape
         except Exception:
-            rows, cols = None, None
+            tmp, rows, cols = None, None, None
+        if tmp is not None and HAS_PYARROW:
+            # Parquet snapshots are typed and compressed, so the store merge
+            # skips CSV re-parsing and dtype inference on every file.
+            path = base + ".parquet"
+            tmp.to_parquet(path, index=False)
+        else:
+            path = base + ".csv"
+            with open(path, "wb") as f:
+                f.write(b)
         new_row = {
             "path": path, "bytes_hash": h, "source": source_label,
             "rows": rows, "cols": cols, "added_at": time.strftime("%Y-%m-%d %H:%M:%S")
         }
-        dfm = pd.concat([dfm, pd.DataFrame([new_row])], ignore_index=True)
-        save_manifest(dfm)
+        _append_manifest_row(manifest_path(), new_row,
+                             ["path", "bytes_hash", "source", "rows", "cols", "added_at"])
         return True, path
     except Exception as e:
         return False, f"Save failed: {e}"
 
 def merge_store_csvs(limit: int) -> pd.DataFrame:
-    """Merge up to `limit` most recent CSVs, attaching each file's store timestamp to rows."""
+    """Merge up to `limit` most recent snapshots (Parquet, or CSV from older
+    stores), attaching each file's store timestamp to rows."""
     dfm = load_manifest()
     if dfm.empty: return pd.DataFrame()
     try:
@@ -420,14 +641,18 @@ def merge_store_csvs(limit: int) -> pd.DataFrame:
     addeds = dfm["added_at"].dropna().tolist()[-limit:]
     for p, added in zip(paths, addeds):
         try:
-            with open(p, "rb") as f:
-                dft = pd.read_csv(f)
+            if p.endswith(".parquet"):
+                dft = pd.read_parquet(p)
+            else:
+                with open(p, "rb") as f:
+                    dft = _read_csv_fast(f)
             dft["_STORE_ADDED_AT"] = added  # attach the store timestamp
             rows.append(dft)
         except Exception:
             continue
     if not rows: return pd.DataFrame()
-    return pd.concat(rows, ignore_index=True)
+    # one concat over all frames; sort=False skips the column-union sort pass
+    return pd.concat(rows, ignore_index=True, sort=False)
 
 col_store_a, col_store_b = st.sidebar.columns(2)
 with col_store_a:
@@ -437,7 +662,7 @@ with col_store_b:
     if st.button("🧹 Clear store", key="clear_store_btn"):
         if ensure_store():
             try:
-                for p in glob.glob(os.path.join(store_dir, "*.csv")):
+                for p in glob.glob(os.path.join(store_dir, "*.csv")) + glob.glob(os.path.join(store_dir, "*.parquet")):
                     os.remove(p)
                 if os.path.exists(manifest_path()):
                     os.remove(manifest_path())
@@ -489,22 +714,31 @@ def try_fetch_csv_url(url: str) -> tuple[pd.DataFrame | None, dict, bytes | None
     if not url:
         return None, {"error": "No URL provided"}, None
     try:
-        r = requests.get(url, timeout=45)
-        if r.status_code >= 300:
-            return None, {"error": f"{r.status_code}: {r.text[:300]}", "source": url}, None
-        df_ = read_any(r.content, name_hint=url)
-        return df_, {"source": url, "bytes": len(r.content)}, r.content
+        # Stream into one growing buffer instead of letting requests join
+        # chunk lists into r.content — lower peak RSS on big reports.
+        with requests.get(url, stream=True, timeout=45) as r:
+            if r.status_code >= 300:
+                return None, {"error": f"{r.status_code}: {r.text[:300]}", "source": url}, None
+            buf = io.BytesIO()
+            for chunk in r.iter_content(chunk_size=1 << 20):
+                buf.write(chunk)
+        raw = buf.getvalue()
+        df_ = read_any_cached(raw, name_hint=url)
+        return df_, {"source": url, "bytes": len(raw)}, raw
     except Exception as e:
         return None, {"error": str(e), "source": url}, None
 
 def load_latest_local_csv(folder: str, pattern: str = "*.csv") -> tuple[pd.DataFrame | None, dict, bytes | None]:
     try:
-        paths = sorted(glob.glob(os.path.join(folder, pattern)), key=lambda p: os.path.getmtime(p))
-        if not paths: return None, {"error": f"No files matching {pattern} in {folder}"}, None
-        latest = paths[-1]
+        # one stat per entry via scandir, and max() instead of a full sort
+        with os.scandir(folder) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it
+                       if e.is_file() and fnmatch.fnmatch(e.name, pattern)]
+        if not entries: return None, {"error": f"No files matching {pattern} in {folder}"}, None
+        mtime, latest = max(entries)
         with open(latest, "rb") as f: b = f.read()
-        df_ = read_any(io.BytesIO(b), name_hint=latest)
-        return df_, {"source": latest, "mtime": os.path.getmtime(latest)}, b
+        df_ = read_any_cached(b, name_hint=latest)
+        return df_, {"source": latest, "mtime": mtime}, b
     except Exception as e:
         return None, {"error": str(e)}, None
 
@@ -525,15 +759,21 @@ try:
             raw_bytes = uploaded.getvalue()
         except Exception:
             raw_bytes = None
-        df = read_any(uploaded); source_meta = {"source": "uploaded file", "name": getattr(uploaded, "name", "")}
+        df = read_any_cached(raw_bytes, name_hint=getattr(uploaded, "name", None)) if raw_bytes else read_any(uploaded)
+        source_meta = {"source": "uploaded file", "name": getattr(uploaded, "name", "")}
 except Exception as e:
     st.error(f"Failed to load data: {e}"); st.stop()
 
 if df is None or df.empty:
     st.warning("The main report appears to be empty."); st.stop()
 
-# Tag and stamp current df; also create store-based timestamp column for trends
-_ING_TS = time.strftime("%Y-%m-%d %H:%M:%S")
+# Tag and stamp current df; also create store-based timestamp column for trends.
+# Stamp once per payload (not per rerun) so the cached KPI pipeline keys stay stable.
+_payload_key = hashlib.sha256(raw_bytes).hexdigest() if raw_bytes else str(source_meta.get("source", ""))
+if st.session_state.get("_ing_key") != _payload_key:
+    st.session_state["_ing_key"] = _payload_key
+    st.session_state["_ing_ts"] = time.strftime("%Y-%m-%d %H:%M:%S")
+_ING_TS = st.session_state["_ing_ts"]
 df["_INGESTED_AT"] = _ING_TS
 df["_STORE_ADDED_AT"] = _ING_TS  # current file uses its ingest time as the trend date
 _saved_main = None
@@ -547,29 +787,25 @@ if _saved_main:
     st.caption(f"Saved uploaded copy: `{_saved_main}`")
 
 # Normalize: "Abandoned (%rec)" -> "Abandon %"
-for c in list(df.columns):
-    if norm(c) == norm("Abandoned (%rec)"):
-        df.rename(columns={c: "Abandon %"}, inplace=True)
+df = rename_aband_rec(df)
 
 st.caption(f"Loaded main report from: **{source_meta.get('source','(unknown)')}**")
 st.subheader("Preview — Main Report (first 20 rows)")
-st.dataframe(df.head(20), use_container_width=True)
+st.dataframe(df.iloc[:20], use_container_width=True)
 
 # ================== Column mapping — no date dropdown ==================
 st.subheader("Column Mapping — Main Report")
-SKILL_SYNS  = ["skill", "skill name", "skill group", "group", "queue", "split", "team", "program", "department", "dept", "category", "line of business", "lob"]
-CALLS_SYNS  = ["calls", "total calls", "calls offered", "offered", "inbound calls", "in calls", "total contacts", "contacts", "total interactions", "volume"]
-AGENTS_SYNS = ["agents staffed", "agents", "agent count", "staffed agents", "distinct agents", "distinct agent count", "unique agents"]
-AHT_SYNS    = ["aht", "average handle time", "avg handle time", "avg handling time", "avg handle", "aht (s)", "aht (sec)", "talk+hold+acw"]
-ABAND_CNT_SYNS = ["abandoned count", "abandoned", "abandon count", "aband count", "abandoned calls"]
-ABAND_PCT_SYNS = ["abandon %", "abandoned (%rec)", "abandonment rate", "abandon rate"]
-
-skill_guess     = find_col(df, SKILL_SYNS)
-calls_guess     = find_col(df, CALLS_SYNS)
-agents_guess    = find_col(df, AGENTS_SYNS)
-aht_guess       = find_col(df, AHT_SYNS)
-aband_cnt_guess = find_col(df, ABAND_CNT_SYNS)
-aband_pct_guess = find_col(df, ABAND_PCT_SYNS)
+
+_guesses = autodetect_columns(df, {
+    "skill": SKILL_SYNS, "calls": CALLS_SYNS, "agents": AGENTS_SYNS,
+    "aht": AHT_SYNS, "aband_cnt": ABAND_CNT_SYNS, "aband_pct": ABAND_PCT_SYNS,
+})
+skill_guess     = _guesses["skill"]
+calls_guess     = _guesses["calls"]
+agents_guess    = _guesses["agents"]
+aht_guess       = _guesses["aht"]
+aband_cnt_guess = _guesses["aband_cnt"]
+aband_pct_guess = _guesses["aband_pct"]
 
 cols = list(df.columns)
 skill_col  = st.selectbox("Skill / Group column", cols, index=idx_or_default(cols, skill_guess or cols[0]))
@@ -582,8 +818,13 @@ abandoned_count_col = st.selectbox("Abandoned (count) column (optional, used if
                                    index=idx_or_default(["<none>"]+cols, aband_cnt_guess if aband_cnt_guess else "<none>"))
 
 # Fortress → PM Connect rename in df for consistency
-df[skill_col] = df[skill_col].astype(str).str.strip()
-df.loc[df[skill_col].str.lower() == "fortress", skill_col] = "PM Connect"
+df[skill_col] = normalize_skill_series(df[skill_col])
+
+# Shrink the mapped count columns: small ints don't need 64 bits, and the
+# narrower arrays speed every downstream coercion/groupby pass.
+for _c in {calls_col, agents_col}:
+    if _c in df.columns and pd.api.types.is_numeric_dtype(df[_c]):
+        df[_c] = pd.to_numeric(df[_c], errors="coerce", downcast="integer")
 
 # Skills of interest
 default_skills = ["B2B Member Success", "B2B Success Activation", "B2B Success Info", "B2B Success Tech Support",
@@ -626,7 +867,7 @@ try:
                 raw2 = uploaded2.getvalue()
             except Exception:
                 raw2 = None
-            second_df = read_any(uploaded2)
+            second_df = read_any_cached(raw2, name_hint=getattr(uploaded2, "name", None)) if raw2 else read_any(uploaded2)
             second_meta = {"source": "uploaded file", "name": getattr(uploaded2, "name", "")}
 except Exception as e:
     st.warning(f"Second report load failed: {e}")
@@ -639,59 +880,80 @@ if second_df is not None and not second_df.empty:
         _saved_second = save_uploaded_copy(raw2, second_meta.get("name") or second_meta.get("source") or "second.csv", role="second")
         if _saved_second:
             st.caption(f"Saved uploaded copy (2nd): `{_saved_second}`")
-    for c in list(second_df.columns):
-        if norm(c) == norm("Abandoned (%rec)"):
-            second_df.rename(columns={c: "Abandon %"}, inplace=True)
+    second_df = rename_aband_rec(second_df)
     st.caption(f"Loaded 2nd report from: **{second_meta.get('source','uploaded file')}**")
-    st.dataframe(second_df.head(10), use_container_width=True)
+    st.dataframe(second_df.iloc[:10], use_container_width=True)
 
 # ================== Core calculations ==================
-calls_num  = pd.to_numeric(df[calls_col],  errors="coerce").fillna(0)
-agents_num = pd.to_numeric(df[agents_col], errors="coerce").fillna(0)
+@st.cache_data(show_spinner=False, hash_funcs=_SKIP_PANDAS_HASH)
+def compute_kpis(df_key: bytes, df_in: pd.DataFrame, skill_col: str, calls_col: str, agents_col: str,
+                 aht_col: str, abandoned_pct_col: str, abandoned_count_col: str) -> dict:
+    """Pure KPI pipeline, cached so widget tweaks don't re-run the pandas work."""
+    # int64 up front: sums stay in numpy (no Python-object path) and the core
+    # table skips the slower Int64 extension dtype.
+    calls_num  = pd.to_numeric(df_in[calls_col],  errors="coerce").fillna(0).astype("int64", copy=False)
+    agents_num = pd.to_numeric(df_in[agents_col], errors="coerce").fillna(0).astype("int64", copy=False)
+
+    rates = None
+    if abandoned_pct_col != "<none>" and abandoned_pct_col in df_in.columns:
+        rates = to_percent(df_in[abandoned_pct_col])
+    aband_num = None
+    if rates is None and abandoned_count_col != "<none>" and abandoned_count_col in df_in.columns:
+        aband_num = pd.to_numeric(df_in[abandoned_count_col], errors="coerce")
+
+    # Keep native dtypes: category SKILL, numeric rate. astype(str) would
+    # objectify whole columns just for display/CSV, which stringify anyway.
+    by_skill_core = pd.DataFrame({
+        "SKILL": df_in[skill_col],
+        "CALLS": calls_num,
+        "Agents Staffed": agents_num,
+        "AHT": df_in[aht_col],
+    })
+    by_skill_core["Abandon %"] = rates.round(2) if rates is not None else np.nan
+
+    # Scalar pieces for the total Abandon %; the divisor (total_calls) may be
+    # overridden by the 2nd report, so the division happens outside the cache.
+    aband_total = aband_num.fillna(0).sum() if aband_num is not None else None
+    weighted_rate_sum = ((rates.fillna(0) / 100.0) * calls_num).sum() if rates is not None else None
+
+    return {
+        "total_calls": calls_num.sum(),
+        "total_agents": agents_num.sum(),
+        "by_skill_core": by_skill_core,
+        "aband_total": aband_total,
+        "weighted_rate_sum": weighted_rate_sum,
+    }
 
-rates = None
-if abandoned_pct_col != "<none>" and abandoned_pct_col in df.columns:
-    rates = to_percent(df[abandoned_pct_col])
-aband_count_col_final = None
-if rates is None and abandoned_count_col != "<none>" and abandoned_count_col in df.columns:
-    aband_count_col_final = abandoned_count_col
+_kpis = compute_kpis(df_cache_key(df), df, skill_col, calls_col, agents_col, aht_col, abandoned_pct_col, abandoned_count_col)
+by_skill_core = _kpis["by_skill_core"]
+# Rate stays numeric in the frame; format it at display time only.
+BY_SKILL_COLCFG = {"Abandon %": st.column_config.NumberColumn("Abandon %", format="%.2f%%")}
 
 # --- Totals (defaults from main report) ---
-total_calls = int(calls_num.sum())
-total_agents = int(agents_num.sum())
+total_calls = _kpis["total_calls"]
+total_agents = _kpis["total_agents"]
 calls_label = "Total Calls (from main report)"
 agents_label = "Agents Staffed (sum of per-skill)"
 
 # --- Override from SECOND report when available ---
-CALLS_SYNS_ALL  = ["calls", "total calls", "calls offered", "offered", "inbound calls", "contacts", "total contacts", "volume"]
 if second_df is not None and not second_df.empty:
-    AGENTS_SYNS_MINI = ["agents staffed", "agents", "agent count", "distinct", "unique"]
     agents2_guess = find_col(second_df, AGENTS_SYNS_MINI) or next((c for c in second_df.columns if "agent" in c.lower()), None)
     if agents2_guess:
-        total_agents = int(pd.to_numeric(second_df[agents2_guess], errors="coerce").fillna(0).sum())
+        total_agents = pd.to_numeric(second_df[agents2_guess], errors="coerce").fillna(0).astype("int64", copy=False).sum()
         agents_label = "Agents Staffed (from 2nd report)"
     calls2_guess = find_col(second_df, CALLS_SYNS_ALL) or next((c for c in second_df.columns if "call" in c.lower() or "offered" in c.lower() or "contact" in c.lower()), None)
     if calls2_guess:
-        total_calls = int(pd.to_numeric(second_df[calls2_guess], errors="coerce").fillna(0).sum())
+        total_calls = pd.to_numeric(second_df[calls2_guess], errors="coerce").fillna(0).astype("int64", copy=False).sum()
         calls_label = "Total Calls (from 2nd report)"
 
 # --- Abandon % total ---
-if aband_count_col_final and total_calls > 0:
-    aband_num_total = pd.to_numeric(df[aband_count_col_final], errors="coerce").fillna(0).sum()
-    total_abandon_pct = (aband_num_total / total_calls) * 100
-elif rates is not None and total_calls > 0:
-    total_abandon_pct = ((rates.fillna(0) / 100.0) * calls_num).sum() / total_calls * 100
+if _kpis["aband_total"] is not None and total_calls > 0:
+    total_abandon_pct = (_kpis["aband_total"] / total_calls) * 100
+elif _kpis["weighted_rate_sum"] is not None and total_calls > 0:
+    total_abandon_pct = _kpis["weighted_rate_sum"] / total_calls * 100
 else:
     total_abandon_pct = None
 
-by_skill_core = pd.DataFrame({
-    "SKILL": df[skill_col].astype(str),
-    "CALLS": calls_num.astype("Int64"),
-    "Agents Staffed": agents_num.astype("Int64"),
-    "AHT": df[aht_col].astype(str),
-})
-by_skill_core["Abandon %"] = (rates.round(2).astype(str) + "%") if rates is not None else "N/A"
-
 # ================== Historical dataset selection ==================
 st.markdown("---")
 st.header("📦 Historical Dataset")
@@ -701,14 +963,26 @@ dataset_scope = st.radio(
     index=1, key="dataset_scope_radio"
 )
 
+@st.cache_data(show_spinner=False)
+def merge_store_cached(manifest_sig: tuple, limit: int) -> pd.DataFrame:
+    """Snapshots are immutable and the manifest is append-only, so the
+    manifest's (mtime, size) pins the whole store state: unchanged stores
+    skip the re-read entirely across reruns."""
+    return merge_store_csvs(limit)
+
 historical_df = pd.DataFrame()
 if dataset_scope != "Current file only":
-    historical_df = merge_store_csvs(limit=max_merge)
+    try:
+        _mst = os.stat(manifest_path())
+        _store_sig = (_mst.st_mtime_ns, _mst.st_size)
+    except OSError:
+        _store_sig = ()
+    historical_df = merge_store_cached(_store_sig, max_merge)
     if historical_df.empty:
         st.info("No historical files found in the store yet. Save a snapshot to start building history.")
     else:
         st.success(f"Merged historical files: {len(historical_df)} rows")
-        st.dataframe(historical_df.head(10), use_container_width=True)
+        st.dataframe(historical_df.iloc[:10], use_container_width=True)
 
 if dataset_scope == "Current file only":
     analysis_df = df.copy()
@@ -718,11 +992,12 @@ else:
     if historical_df.empty:
         analysis_df = df.copy()
     else:
-        # UNION of columns so the store date column stays present
-        union_cols = sorted(set(df.columns).union(set(historical_df.columns)))
+        # UNION of columns so the store date column stays present; reindex
+        # aligns both frames once so concat does no second alignment pass
+        union_cols = sorted(set(df.columns).union(historical_df.columns))
         analysis_df = pd.concat(
             [historical_df.reindex(columns=union_cols), df.reindex(columns=union_cols)],
-            ignore_index=True,
+            ignore_index=True, sort=False,
         )
 
 # ================== Save snapshot button ==================
@@ -747,24 +1022,31 @@ with col_snap_b:
         st.session_state["_show_manifest"] = True
 
 # ================== Filled Report (Core) ==================
-md = io.StringIO()
-def writeln(s=""): md.write(s + "\n")
-writeln("## Autofilled Metrics (Core)\n")
-writeln(f"### 3. {calls_label}\n**{total_calls}**\n")
-writeln(f"### 4. {agents_label}\n**{total_agents}**\n")
-writeln("### 6. Abandon %")
-writeln(f"**{(str(round(total_abandon_pct, 2)) + '%') if total_abandon_pct is not None else 'N/A'}**\n")
-writeln("### 7. AHT (By Group)")
-for sk in skills_wanted:
-    mask = by_skill_core["SKILL"].str.lower() == sk.lower()
-    val = by_skill_core.loc[mask, "AHT"]
-    writeln(f"- **{sk}:** {val.iloc[0] if len(val) else 'Not found in this report'}")
-writeln("\n### 8. Abandon % (By Group)")
-for sk in skills_wanted:
-    mask = by_skill_core["SKILL"].str.lower() == sk.lower()
-    val = by_skill_core.loc[mask, "Abandon %"]
-    writeln(f"- **{sk}:** {val.iloc[0] if len(val) else 'Not found in this report'}")
-report_md = md.getvalue()
+lines: list[str] = []
+lines.append("## Autofilled Metrics (Core)\n")
+lines.append(f"### 3. {calls_label}\n**{total_calls}**\n")
+lines.append(f"### 4. {agents_label}\n**{total_agents}**\n")
+lines.append("### 6. Abandon %")
+lines.append(f"**{(str(round(total_abandon_pct, 2)) + '%') if total_abandon_pct is not None else 'N/A'}**\n")
+# One lowercased pass builds plain-dict lookups; each skill is then an O(1) probe
+_aht_map, _ab_map = {}, {}
+for _k, _a, _b in zip(by_skill_core["SKILL"].str.lower(),
+                      by_skill_core["AHT"], by_skill_core["Abandon %"]):
+    if _k not in _aht_map:  # keep the first occurrence, like the old masks did
+        _aht_map[_k] = _a; _ab_map[_k] = _b
+_sk_keys = [s.lower() for s in skills_wanted]
+lines.append("### 7. AHT (By Group)")
+for sk, key in zip(skills_wanted, _sk_keys):
+    val = _aht_map.get(key)
+    lines.append(f"- **{sk}:** {val if val is not None and pd.notna(val) else 'Not found in this report'}")
+lines.append("\n### 8. Abandon % (By Group)")
+for sk, key in zip(skills_wanted, _sk_keys):
+    if key in _ab_map:
+        v = _ab_map[key]
+        lines.append(f"- **{sk}:** {f'{v:.2f}%' if pd.notna(v) else 'N/A'}")
+    else:
+        lines.append(f"- **{sk}:** Not found in this report")
+report_md = "\n".join(lines) + "\n"
 
 st.subheader("Filled Report (Core)")
 st.markdown(report_md)
@@ -785,22 +1067,22 @@ with tabs[1]:
     st.dataframe(disp, use_container_width=True)
     st.code(kpi_df.to_csv(index=False), language="text")
 with tabs[2]:
-    st.dataframe(by_skill_core, use_container_width=True)
-    st.code(by_skill_core.to_csv(index=False), language="text")
+    st.dataframe(by_skill_core, use_container_width=True, column_config=BY_SKILL_COLCFG)
+    st.code(df_csv(by_skill_core), language="text")
 with tabs[3]:
-    st.dataframe(by_skill_core, use_container_width=True)
-    st.code(by_skill_core.to_csv(index=False, sep="\t"), language="text")
+    st.dataframe(by_skill_core, use_container_width=True, column_config=BY_SKILL_COLCFG)
+    st.code(df_csv(by_skill_core, sep="\t"), language="text")
 with tabs[4]:
-    prev_csv = df.head(20).to_csv(index=False)
-    st.dataframe(df.head(20), use_container_width=True)
-    st.code(prev_csv, language="text")
+    preview_df = df.iloc[:20]
+    st.dataframe(preview_df, use_container_width=True)
+    st.code(df_csv(preview_df), language="text")
 
 st.subheader("Downloads")
 st.download_button("⬇️ Download report (Markdown)", data=report_md.encode("utf-8"),
                    file_name="filled_report_core.md", mime="text/markdown")
 
 st.subheader("By-Skill Table — Core Fields")
-st.dataframe(by_skill_core, use_container_width=True)
+st.dataframe(by_skill_core, use_container_width=True, column_config=BY_SKILL_COLCFG)
 
 # ================== Skill Trends (using store timestamp) ==================
 st.markdown("---")
@@ -813,10 +1095,9 @@ if "_STORE_ADDED_AT" not in trend_df.columns:
 
 # Normalize skills
 if skill_col in trend_df.columns:
-    trend_df[skill_col] = trend_df[skill_col].astype(str).str.strip()
-    trend_df.loc[trend_df[skill_col].str.lower() == "fortress", skill_col] = "PM Connect"
+    trend_df[skill_col] = normalize_skill_series(trend_df[skill_col])
 
-trend_df["_AHT_sec"] = trend_df[aht_col].apply(parse_duration_to_seconds) if aht_col in trend_df.columns else np.nan
+trend_df["_AHT_sec"] = vec_parse_duration_to_seconds(trend_df[aht_col]) if aht_col in trend_df.columns else np.nan
 trend_df = add_time_columns(trend_df, "_STORE_ADDED_AT")
 
 rate_series = None
@@ -827,24 +1108,42 @@ aband_count_col_final_for_trend = abandoned_count_col if (abandoned_count_col !=
 if skill_col not in trend_df.columns or calls_col not in trend_df.columns:
     st.info("Trends need at least the Skill and Calls columns present in the merged dataset.")
 else:
-    daily_all   = aggregate_by_period_all_skills(trend_df, skill_col, calls_col, "_AHT_sec", rate_series, aband_count_col_final_for_trend, "_DATE")
-    weekly_all  = aggregate_by_period_all_skills(trend_df, skill_col, calls_col, "_AHT_sec", rate_series, aband_count_col_final_for_trend, "_WEEK_START")
-    monthly_all = aggregate_by_period_all_skills(trend_df, skill_col, calls_col, "_AHT_sec", rate_series, aband_count_col_final_for_trend, "_MONTH_START")
-
-    all_skills_sorted = sorted([str(x) for x in trend_df[skill_col].dropna().unique()]) if skill_col in trend_df.columns else []
+    # rate_series' own hash is skipped, so fold its source column into the key
+    trend_key = df_cache_key(trend_df) + str(abandoned_pct_col).encode()
+    prepped_trend = prepare_trend_frame(trend_key, trend_df, skill_col, calls_col, "_AHT_sec", rate_series, aband_count_col_final_for_trend)
+    daily_all = aggregate_by_period_all_skills(trend_key, prepped_trend, skill_col, "_DATE")
+
+    if skill_col in trend_df.columns:
+        _sk = trend_df[skill_col]
+        # categorical skill column: categories are already the sorted distinct
+        # values, so no O(rows) unique scan is needed
+        all_skills_sorted = (_sk.cat.categories.tolist()
+                             if isinstance(_sk.dtype, pd.CategoricalDtype)
+                             else sorted([str(x) for x in _sk.dropna().unique()]))
+    else:
+        all_skills_sorted = []
     if not all_skills_sorted:
         st.info("No skill data found to plot. Check your column mapping and historical files.")
     else:
         skill_choice = st.selectbox("Single skill", all_skills_sorted,
                                     index=idx_or_default(all_skills_sorted, "PM Connect" if "PM Connect" in all_skills_sorted else all_skills_sorted[0]),
                                     key="single_skill_select")
-
-        def filter_skill(df_in, skill):
-            return df_in[df_in["Skill"].astype(str).str.lower() == skill.lower()].copy()
-
-        daily   = filter_skill(daily_all,   skill_choice)
-        weekly  = filter_skill(weekly_all,  skill_choice)
-        monthly = filter_skill(monthly_all, skill_choice)
+        # Weekly/monthly rollups are only computed while this is ticked,
+        # which skips two of the three aggregation passes on big datasets.
+        show_wm = st.checkbox("Include weekly/monthly rollups", value=True, key="show_weekly_monthly")
+        if show_wm:
+            weekly_all  = aggregate_by_period_all_skills(trend_key, prepped_trend, skill_col, "_WEEK_START")
+            monthly_all = aggregate_by_period_all_skills(trend_key, prepped_trend, skill_col, "_MONTH_START")
+
+        def by_skill_dict(df_in):
+            # one grouping pass replaces a lowercase scan per skill lookup
+            return {str(k).lower(): g for k, g in df_in.groupby("Skill", sort=False, dropna=False)}
+
+        _want = skill_choice.lower()
+        daily = by_skill_dict(daily_all).get(_want, daily_all.iloc[0:0]).copy()
+        if show_wm:
+            weekly  = by_skill_dict(weekly_all).get(_want, weekly_all.iloc[0:0]).copy()
+            monthly = by_skill_dict(monthly_all).get(_want, monthly_all.iloc[0:0]).copy()
 
         def delta_str(series):
             if len(series) < 2 or pd.isna(series.iloc[-2]) or pd.isna(series.iloc[-1]): return "—"
@@ -852,19 +1151,20 @@ else:
             sign = "▲" if diff > 0 else ("▼" if diff < 0 else "—")
             return f"{sign} {diff:.2f}"
 
-        k1, k2, k3, k4 = st.columns(4)
+        k1, k2, k3, k4 = st.columns(4) if show_wm else (*st.columns(2), None, None)
         with k1:
             st.metric("Last AHT (Daily)", daily["AHT"].iloc[-1] if not daily.empty else "N/A",
                       delta=delta_str(daily["AHT_sec"]) if not daily.empty else "—")
         with k2:
             st.metric("Last Abandon % (Daily)", f"{daily['Abandon %'].iloc[-1]:.2f}%" if (not daily.empty and pd.notna(daily['Abandon %'].iloc[-1])) else "N/A",
                       delta=delta_str(daily["Abandon %"]) if not daily.empty else "—")
-        with k3:
-            st.metric("Last AHT (Weekly)", weekly["AHT"].iloc[-1] if not weekly.empty else "N/A",
-                      delta=delta_str(weekly["AHT_sec"]) if not weekly.empty else "—")
-        with k4:
-            st.metric("Last Abandon % (Weekly)", f"{weekly['Abandon %'].iloc[-1]:.2f}%" if (not weekly.empty and pd.notna(weekly['Abandon %'].iloc[-1])) else "N/A",
-                      delta=delta_str(weekly["Abandon %"]) if not weekly.empty else "—")
+        if show_wm:
+            with k3:
+                st.metric("Last AHT (Weekly)", weekly["AHT"].iloc[-1] if not weekly.empty else "N/A",
+                          delta=delta_str(weekly["AHT_sec"]) if not weekly.empty else "—")
+            with k4:
+                st.metric("Last Abandon % (Weekly)", f"{weekly['Abandon %'].iloc[-1]:.2f}%" if (not weekly.empty and pd.notna(weekly['Abandon %'].iloc[-1])) else "N/A",
+                          delta=delta_str(weekly["Abandon %"]) if not weekly.empty else "—")
 
         # ---------- chart helpers ----------
         def alt_line_chart(df_in: pd.DataFrame, y_col: str, y_title: str):
@@ -908,23 +1208,24 @@ else:
         with c2: line_chart(daily, "Abandon %", "Abandon %")
         st.dataframe(daily.assign(**{"Abandon %": daily["Abandon %"].round(2)}), use_container_width=True)
 
-        st.subheader(f"Weekly — {skill_choice}")
-        c3, c4 = st.columns(2)
-        with c3: line_chart(weekly, "AHT_sec", "AHT (seconds)")
-        with c4: line_chart(weekly, "Abandon %", "Abandon %")
-        st.dataframe(weekly.assign(**{"Abandon %": weekly["Abandon %"].round(2)}), use_container_width=True)
+        if show_wm:
+            st.subheader(f"Weekly — {skill_choice}")
+            c3, c4 = st.columns(2)
+            with c3: line_chart(weekly, "AHT_sec", "AHT (seconds)")
+            with c4: line_chart(weekly, "Abandon %", "Abandon %")
+            st.dataframe(weekly.assign(**{"Abandon %": weekly["Abandon %"].round(2)}), use_container_width=True)
 
-        st.subheader(f"Monthly — {skill_choice}")
-        c5, c6 = st.columns(2)
-        with c5: line_chart(monthly, "AHT_sec", "AHT (seconds)")
-        with c6: line_chart(monthly, "Abandon %", "Abandon %")
-        st.dataframe(monthly.assign(**{"Abandon %": monthly["Abandon %"].round(2)}), use_container_width=True)
+            st.subheader(f"Monthly — {skill_choice}")
+            c5, c6 = st.columns(2)
+            with c5: line_chart(monthly, "AHT_sec", "AHT (seconds)")
+            with c6: line_chart(monthly, "Abandon %", "Abandon %")
+            st.dataframe(monthly.assign(**{"Abandon %": monthly["Abandon %"].round(2)}), use_container_width=True)
 
         # ---------- Multi-skill compare ----------
         st.markdown("---")
         st.header("🔀 Multi-skill Compare (overlay)")
 
-        all_skills_sorted2 = sorted(daily_all["Skill"].unique().tolist())
+        all_skills_sorted2 = all_skills_sorted  # same skills; avoids rescanning daily_all
         default_preselect = [s for s in ["PM Connect"] if s in all_skills_sorted2] or all_skills_sorted2[:3]
         multi = st.multiselect("Select skills to compare", all_skills_sorted2, default=default_preselect, key="multi_skills_select")
 
@@ -955,7 +1256,7 @@ else:
             if df_in.empty: st.info("No data for the selected skills."); return
             df_plot = df_in.copy()
             df_plot[y_col] = pd.to_numeric(df_plot[y_col], errors="coerce")
-            p = df_plot.pivot_table(index="period", columns="Skill", values=y_col, aggfunc="mean")
+            p = df_plot.pivot_table(index="period", columns="Skill", values=y_col, aggfunc="mean", observed=True)
             st.line_chart(p)
 
         def overlay_chart(df_in: pd.DataFrame, y_col: str, title: str):
@@ -964,9 +1265,7 @@ else:
             else:          overlay_st(df_in, y_col, title)
 
         if multi:
-            d_daily   = daily_all[daily_all["Skill"].isin(multi)].copy()
-            d_weekly  = weekly_all[weekly_all["Skill"].isin(multi)].copy()
-            d_monthly = monthly_all[daily_all["Skill"].isin(multi)].copy() if False else monthly_all[monthly_all["Skill"].isin(multi)].copy()
+            d_daily = daily_all[daily_all["Skill"].isin(multi)].copy()
 
             st.subheader("Daily compare")
             oc1, oc2 = st.columns(2)
@@ -974,66 +1273,137 @@ else:
             with oc2: overlay_chart(d_daily, "Abandon %", "Abandon %")
             st.dataframe(d_daily.assign(**{"Abandon %": d_daily["Abandon %"].round(2)}), use_container_width=True)
 
-            st.subheader("Weekly compare")
-            oc3, oc4 = st.columns(2)
-            with oc3: overlay_chart(d_weekly, "AHT_sec", "AHT (seconds)")
-            with oc4: overlay_chart(d_weekly, "Abandon %", "Abandon %")
-            st.dataframe(d_weekly.assign(**{"Abandon %": d_weekly["Abandon %"].round(2)}), use_container_width=True)
+            if show_wm:
+                d_weekly  = weekly_all[weekly_all["Skill"].isin(multi)].copy()
+                d_monthly = monthly_all[monthly_all["Skill"].isin(multi)].copy()
+
+                st.subheader("Weekly compare")
+                oc3, oc4 = st.columns(2)
+                with oc3: overlay_chart(d_weekly, "AHT_sec", "AHT (seconds)")
+                with oc4: overlay_chart(d_weekly, "Abandon %", "Abandon %")
+                st.dataframe(d_weekly.assign(**{"Abandon %": d_weekly["Abandon %"].round(2)}), use_container_width=True)
 
-            st.subheader("Monthly compare")
-            oc5, oc6 = st.columns(2)
-            with oc5: overlay_chart(d_monthly, "AHT_sec", "AHT (seconds)")
-            with oc6: overlay_chart(d_monthly, "Abandon %", "Abandon %")
-            st.dataframe(d_monthly.assign(**{"Abandon %": d_monthly["Abandon %"].round(2)}), use_container_width=True)
+                st.subheader("Monthly compare")
+                oc5, oc6 = st.columns(2)
+                with oc5: overlay_chart(d_monthly, "AHT_sec", "AHT (seconds)")
+                with oc6: overlay_chart(d_monthly, "Abandon %", "Abandon %")
+                st.dataframe(d_monthly.assign(**{"Abandon %": d_monthly["Abandon %"].round(2)}), use_container_width=True)
 
 # ================== Word/PDF exports ==================
-try:
+@st.cache_resource(show_spinner=False)
+def _docx_document_cls():
+    """Resolve python-docx once per process instead of re-importing per rerun."""
     from docx import Document
+    return Document
+
+@st.cache_resource(show_spinner=False)
+def _pdf_backend() -> dict:
+    """Resolve the PDF stack once per process: reportlab preferred, fpdf2 fallback."""
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        return {"kind": "reportlab", "letter": letter, "styles": getSampleStyleSheet(),
+                "SimpleDocTemplate": SimpleDocTemplate, "Paragraph": Paragraph, "Spacer": Spacer}
+    except Exception:
+        from fpdf import FPDF
+        return {"kind": "fpdf", "FPDF": FPDF}
+
+docx_ready = False
+try:
+    _docx_document_cls()
+    @st.cache_data(show_spinner=False, ttl=3600)
     def build_docx(md_text):
+        # One regex sweep classifies every line up front; the lxml-backed
+        # python-docx calls then run over the pre-filtered batch only.
+        Document = _docx_document_cls()
+        elements = []
+        for line in io.StringIO(md_text):  # streamed; no materialized line list
+            line = line.rstrip("\n")
+            m = _HDR_RE.match(line)
+            if m:
+                if len(m.group(1)) == 3:  # "##" top header is re-added below
+                    elements.append((2, m.group(2)))
+            elif line.strip():
+                elements.append((0, line))
         doc = Document(); doc.add_heading("Autofilled Metrics (Core)", level=1)
-        for line in md_text.splitlines():
-            if line.startswith("### "): doc.add_heading(line.replace("### ", ""), level=2)
-            elif line.startswith("## "): continue
-            else:
-                if line.strip(): doc.add_paragraph(line)
-        bio = io.BytesIO(); doc.save(bio); bio.seek(0); return bio.getvalue()
-    st.download_button("⬇️ Download core report (Word .docx)", data=build_docx(report_md),
-                       file_name="filled_report_core.docx",
-                       mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        add_h, add_p = doc.add_heading, doc.add_paragraph  # bind once for the emit loop
+        for level, text in elements:
+            if level: add_h(text, level=level)
+            else:     add_p(text)
+        bio = io.BytesIO(); doc.save(bio); return bio.getvalue()
+    docx_ready = True
 except Exception as e:
     st.info(f"Word export disabled: {e}")
 
 # Preferred PDF via ReportLab; fallback to fpdf2 if installed
 pdf_ready = False
 try:
-    from reportlab.lib.pagesizes import letter
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import inch
+    _pdf_backend()
+    from xml.sax.saxutils import escape as _xml_escape
+    @st.cache_data(show_spinner=False, ttl=3600)
     def build_pdf(md_text):
-        bio = io.BytesIO(); c = canvas.Canvas(bio, pagesize=letter)
-        width, height = letter; L = 0.75 * inch; T = 0.75 * inch; B = 0.75 * inch
-        y = height - T; c.setFont("Times-Bold", 14); c.drawString(L, y, "Autofilled Metrics (Core)"); y -= 0.3*inch
-        c.setFont("Times-Roman", 11); import textwrap as _tw
-        for line in md_text.splitlines():
-            if not line.strip(): y -= 0.18*inch
-            else:
-                for w in _tw.wrap(line, width=95): c.drawString(L, y, w); y -= 0.18*inch
-            if y < B: c.showPage(); y = height - T; c.setFont("Times-Roman", 11)
-        c.showPage(); c.save(); bio.seek(0); return bio.getvalue()
+        be = _pdf_backend()
+        if be["kind"] == "reportlab":
+            # Platypus flows/wraps text natively — no per-line textwrap loop,
+            # and wrapping uses real font metrics instead of character counts.
+            styles = be["styles"]
+            bio = io.BytesIO()
+            doc = be["SimpleDocTemplate"](bio, pagesize=be["letter"])
+            flow = [be["Paragraph"]("Autofilled Metrics (Core)", styles["Title"])]
+            for line in io.StringIO(md_text):  # streamed; no materialized line list
+                line = line.rstrip("\n")
+                m = _HDR_RE.match(line)
+                if m:
+                    if len(m.group(1)) == 3:  # "##" top header is re-added above
+                        flow.append(be["Paragraph"](_xml_escape(m.group(2)), styles["Heading2"]))
+                elif not line.strip():
+                    flow.append(be["Spacer"](1, 6))
+                else:
+                    flow.append(be["Paragraph"](_xml_escape(line), styles["BodyText"]))
+            doc.build(flow)
+            return bio.getvalue()
+        pdf = be["FPDF"](); pdf.set_auto_page_break(auto=True, margin=15); pdf.add_page()
+        pdf.set_font("Helvetica", size=11)
+        for line in io.StringIO(md_text):
+            line = line.rstrip("\n")
+            pdf.multi_cell(0, 6, line if line.strip() else " ")
+        return pdf.output(dest="S").encode("latin1")
     pdf_ready = True
-except Exception:
-    try:
-        from fpdf import FPDF
-        def build_pdf(md_text):
-            pdf = FPDF(); pdf.set_auto_page_break(auto=True, margin=15); pdf.add_page()
-            pdf.set_font("Helvetica", size=11)
-            for line in md_text.splitlines():
-                pdf.multi_cell(0, 6, line if line.strip() else " ")
-            return pdf.output(dest="S").encode("latin1")
-        pdf_ready = True
-    except Exception as e:
-        st.info(f"PDF export disabled: {e}")
-
-if pdf_ready:
-    st.download_button("⬇️ Download core report (PDF)", data=build_pdf(report_md),
-                       file_name="filled_report_core.pdf", mime="application/pdf")
+except Exception as e:
+    st.info(f"PDF export disabled: {e}")
+
+def _exports_section():
+    # Documents are only materialized once the user asks for them; until then
+    # reruns pay nothing for the export path.
+    if (docx_ready or pdf_ready) and not st.session_state.get("_exports_ready"):
+        if st.button("🛠️ Prepare Word/PDF downloads", key="prep_exports_btn"):
+            st.session_state["_exports_ready"] = True
+    if st.session_state.get("_exports_ready"):
+        docx_bytes = pdf_bytes = None
+        if docx_ready and pdf_ready:
+            # independent builders over the same markdown — overlap the first
+            # (uncached) materialization; cache hits make this a no-op cost
+            try:
+                with ThreadPoolExecutor(max_workers=2) as ex:
+                    f_docx = ex.submit(build_docx, report_md)
+                    f_pdf = ex.submit(build_pdf, report_md)
+                    docx_bytes = f_docx.result()
+                    pdf_bytes = f_pdf.result()
+            except Exception:
+                docx_bytes = pdf_bytes = None  # fall back to sequential below
+        if docx_ready:
+            st.download_button("⬇️ Download core report (Word .docx)",
+                               data=docx_bytes if docx_bytes is not None else build_docx(report_md),
+                               file_name="filled_report_core.docx",
+                               mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        if pdf_ready:
+            st.download_button("⬇️ Download core report (PDF)",
+                               data=pdf_bytes if pdf_bytes is not None else build_pdf(report_md),
+                               file_name="filled_report_core.pdf", mime="application/pdf")
+
+# As a fragment, the prepare/download clicks rerun only this section instead
+# of the whole script (st.fragment is still experimental on 1.36).
+if hasattr(st, "experimental_fragment"):
+    _exports_section = st.experimental_fragment(_exports_section)
+_exports_section()